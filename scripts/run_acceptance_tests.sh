@@ -104,10 +104,10 @@ PROJECT_RESPONSE=$(curl -s -X POST -H "Content-Type: application/json" \
     -d '{"title":"Test Project"}' \
     http://localhost:5001/projects/create)
 
-test_check "Project creation works" "echo $PROJECT_RESPONSE | grep -q 'project_id'"
+test_check "Project creation works" "echo '$PROJECT_RESPONSE' | grep -q 'project_id'"
 
 # Extract project ID
-PROJECT_ID=$(echo $PROJECT_RESPONSE | grep -o '"project_id":"[^"]*"' | cut -d'"' -f4)
+PROJECT_ID=$(echo $PROJECT_RESPONSE | grep -o '"project_id": *"[^"]*"' | cut -d'"' -f4)
 
 if [ ! -z "$PROJECT_ID" ]; then
     echo "Created test project: $PROJECT_ID"
@@ -118,11 +118,21 @@ if [ ! -z "$PROJECT_ID" ]; then
         -F "file=@seed_data/level1/student_marks.csv" \
         http://localhost:5001/projects/$PROJECT_ID/upload)
     
-    test_check "File upload works" "echo $UPLOAD_RESPONSE | grep -q 'success'"
+    test_check "File upload works" "echo '$UPLOAD_RESPONSE' | grep -q 'success'"
     
     # Test preview
     PREVIEW_RESPONSE=$(curl -s http://localhost:5001/projects/$PROJECT_ID/dataset/preview)
-    test_check "Preview endpoint works" "echo $PREVIEW_RESPONSE | grep -q 'columns'"
+    test_check "Preview endpoint works" "echo '$PREVIEW_RESPONSE' | grep -q 'columns'"
+    
+    # Storage report: the total covers the project folder and its export zip, protected or not
+    curl -s -X POST http://localhost:5001/projects/$PROJECT_ID/export > /dev/null
+    STORAGE_RESPONSE=$(curl -s "http://localhost:5001/storage/report?project_id=$PROJECT_ID")
+    STORAGE_CHECK='import json, os, sys
+r = json.load(sys.stdin)["projects"][0]
+on_disk = sum(os.path.getsize(os.path.join(d, f)) for d, _, fs in os.walk("artifacts/projects/" + r["project_id"]) for f in fs)
+on_disk += os.path.getsize("artifacts/exports/project_%s_export.zip" % r["project_id"])
+assert 0 < r["protected_bytes"] <= r["total_bytes"] and r["total_bytes"] >= on_disk'
+    test_check "Storage report counts protected bytes in the total" "echo '$STORAGE_RESPONSE' | python3 -c \"\$STORAGE_CHECK\""
 fi
 
 # Cleanup